@@ -4,3 +4,6 @@ __author__ = "nil0x42 <http://goo.gl/kb2wf>"
 from .lexer import Lexer, lex
 from .parser import Parser, parse
 from .shell import Shell
+from .completion import CompletionCache
+from .prompt import Prompt
+from . import session
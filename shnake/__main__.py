@@ -0,0 +1,30 @@
+"""Run a shnake script file, or start an interactive shell.
+
+Usage: python -m shnake [-e] [script.shn]
+
+"""
+
+import sys
+import argparse
+
+from .shell import Shell
+
+__author__ = "nil0x42 <http://goo.gl/kb2wf>"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m shnake")
+    parser.add_argument("-e", dest="fatal_errors", action="store_true",
+                        help="exit as soon as a command fails (set -e)")
+    parser.add_argument("script", nargs="?",
+                        help="script file to run (interactive if omitted)")
+    args = parser.parse_args(argv)
+
+    shell = Shell()
+    if args.script is None:
+        return shell.cmdloop()
+    return shell.run_file(args.script, fatal_errors=args.fatal_errors)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Shnake's cached completion provider
+
+Slow complete_*() methods (listing remote files for example) freeze
+the readline prompt each time the user hits Tab. The CompletionCache
+class keeps their results for a while, and can run them in the
+background, giving up after a timeout.
+
+Take a look at shell.py complete() and prefetch_completions() methods.
+
+"""
+
+import time
+import threading
+
+__author__ = "nil0x42 <http://goo.gl/kb2wf>"
+
+
+class _Job:
+    """A completion function running in a background thread.
+
+    Matches are appended to `matches` as soon as they are yielded,
+    so a partial result can be read before the job is finished.
+
+    """
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.matches = []
+        self.failed = False
+        self.discarded = False
+        self.thread = None
+
+    def run(self):
+        try:
+            for match in self.func(*self.args):
+                self.matches.append(match)
+        except BaseException:
+            self.failed = True
+
+
+class CompletionCache:
+    """TTL-bounded cache of completion matches.
+
+    Entries are indexed by a (command, argument position, prefix) key,
+    where `prefix` is the full text of the argument being completed,
+    while completion functions only get readline's `text`, which
+    stops at the last delimiter (such as "/").
+
+    Case study:
+    -----------
+    >>> cache = CompletionCache(ttl=5, timeout=0.2)
+    >>> key = ("ls", 1, "/tmp/fo")
+    >>> cache.query(key, complete_ls, "fo", "ls /tmp/fo", 8, 10)
+    ['foo', 'foobar']
+
+    A query is answered without calling the completion function if a
+    fresh (younger than `ttl` seconds) entry exists for the same key,
+    or for any shorter prefix of the same command and argument position
+    which only differs by its `text` (same part before the delimiter),
+    in which case the cached superset is filtered on `text`.
+
+    If `timeout` is None, the completion function is called
+    synchronously. Otherwise, it runs in a background thread, and
+    if it takes more than `timeout` seconds, the query returns stale
+    matches (expired entries) if any, or else the matches collected so
+    far. The thread keeps running, and its result is cached as soon as
+    it finishes, so it is available for the next query.
+
+    At most `maxsize` entries are kept, oldest ones being dropped first.
+
+    """
+    def __init__(self, ttl=0, timeout=None, maxsize=256):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.entries = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, key, text, stale=False):
+        """Return cached matches of `text` for `key`, or None.
+
+        The entry of the longest prefix of `key`'s prefix is used,
+        and its matches are filtered to only keep those starting with
+        `text`. Entries whose part before `text` differs are ignored,
+        as their matches complete another path level.
+        If `stale` is True, expired entries are also accepted.
+
+        """
+        name, argpos, prefix = key
+        head = len(prefix) - len(text)
+        now = time.monotonic()
+        with self.lock:
+            for i in range(len(prefix), head - 1, -1):
+                entry = self.entries.get((name, argpos, prefix[:i]))
+                if entry is None:
+                    continue
+                timestamp, offset, matches = entry
+                if offset != head:
+                    continue
+                if stale or now - timestamp < self.ttl:
+                    return [m for m in matches if m.startswith(text)]
+        return None
+
+    def store(self, key, text, matches):
+        """Cache `matches` as the completion result of `text` for `key`.
+
+        """
+        offset = len(key[2]) - len(text)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic(), offset, list(matches))
+            while len(self.entries) > self.maxsize:
+                del self.entries[next(iter(self.entries))]
+
+    def invalidate(self, name):
+        """Drop cached entries of the `name` command, and forget its
+        running jobs, whose results will not be cached.
+
+        """
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == name]:
+                del self.entries[key]
+            for key in [k for k in self.jobs if k[0] == name]:
+                self.jobs.pop(key).discarded = True
+
+    def clear(self):
+        """Drop all cached entries.
+
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def submit(self, key, func, text, *args):
+        """Run `func(text, *args)` in a background thread, and cache its
+        result under `key` once finished.
+
+        If a job is already running for `key`, it is returned
+        instead of starting a new one.
+
+        """
+        def run():
+            job.run()
+            with self.lock:
+                if job.discarded:
+                    return
+                del self.jobs[key]
+            if not job.failed:
+                self.store(key, text, job.matches)
+
+        with self.lock:
+            if key in self.jobs:
+                return self.jobs[key]
+            job = _Job(func, (text,) + args)
+            job.thread = threading.Thread(target=run, daemon=True)
+            self.jobs[key] = job
+            job.thread.start()
+        return job
+
+    def prefetch(self, key, func, text, *args):
+        """Compute completions for `key` in background, replacing
+        cached entries of its command, which are dropped at once.
+        It never blocks.
+
+        """
+        self.invalidate(key[0])
+        self.submit(key, func, text, *args)
+
+    def query(self, key, func, text, *args):
+        """Return the completion matches for `key`, calling
+        `func(text, *args)` to compute them if they are not cached.
+
+        """
+        matches = self.lookup(key, text)
+        if matches is not None:
+            return matches
+
+        if self.timeout is None:
+            matches = list(func(text, *args))
+            self.store(key, text, matches)
+            return matches
+
+        job = self.submit(key, func, text, *args)
+        job.thread.join(self.timeout)
+        matches = self.lookup(key, text, stale=True)
+        if matches is not None:
+            return matches
+        return list(job.matches)
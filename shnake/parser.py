@@ -30,7 +30,7 @@ class LineBuffer:
         line = self.file.readline()
         if not line:
             return ""
-        return line.splitlines()[0] + "\n"
+        return line.rstrip("\r\n") + "\n"
 
 
 
@@ -44,32 +44,49 @@ class Parser:
         """Interpret `file` data as a command line sequence.
 
         """
-        line = 0
         result = []
-        buffer = LineBuffer(string)
+        for _, pipeline in self.iterparse(string, lexer=lexer):
+            result += pipeline
+        return result
+
+
+    def iterparse(self, file, lexer=shnake_lex):
+        """Parse `file` (a str or a file object) incrementally,
+        yielding a (line, pipeline) tuple as soon as each pipeline
+        is complete, `line` being the number of its first line.
+
+        Syntax errors are raised with a `line` attribute set to
+        the number of the first line of the faulty pipeline.
+
+        """
+        line = 0
+        buffer = LineBuffer(file)
 
-        data = ""
         while True:
+            data = buffer.readline()
             if not data:
-                data = buffer.readline()
-                if not data:
-                    return result
-
-            line += 1;
-            try:
-                pipeline = lexer(data[:-1], line=line)
-                result += pipeline
-                data = ""
-                if string is None:
+                return
+            line += 1
+            start = line
+
+            while True:
+                try:
+                    pipeline = lexer(data[:-1], line=start)
                     break
 
-            except SyntaxWarning as error:
-                addline = buffer.readline()
-                if not addline:
+                except SyntaxWarning as error:
+                    addline = buffer.readline()
+                    if not addline:
+                        error.line = start
+                        raise error
+                    line += 1
+                    data += addline
+
+                except SyntaxError as error:
+                    error.line = start
                     raise error
-                data += addline
 
-        return result
+            yield start, pipeline
 
 
 parse = Parser()
@@ -0,0 +1,87 @@
+"""Shnake's prompt rendering helpers
+
+The Prompt class builds dynamic prompts out of segments that are only
+recomputed when their inputs change, and wrap_ansi() makes colored
+prompts readline friendly.
+
+Take a look at shell.py raw_input() method.
+
+"""
+
+import re
+import functools
+
+__author__ = "nil0x42 <http://goo.gl/kb2wf>"
+
+ANSI_PATTERN = re.compile("\x01?(\x1b\\[((?:\\d|;)*)([a-zA-Z]))\x02?")
+
+
+@functools.lru_cache(maxsize=64)
+def wrap_ansi(prompt):
+    """Fix readline ansi colored prompt length missinterpretation by
+    wrapping terminal ansi codes as "ANSI" = "\\x01ANSI\\x02".
+
+    Results are memoized, so an unchanged prompt is only wrapped once.
+
+    """
+    return ANSI_PATTERN.sub("\x01\\1\x02", prompt)
+
+
+class Prompt:
+    """Dynamic prompt string made of lazily computed segments.
+
+    Its __init__() method takes a str.format() template as argument,
+    each replacement field being a segment name.
+    The prompt is rendered by str(), and can be used anywhere a
+    Shell's prompt or prompt_ps2 string is expected.
+
+    Case study:
+    -----------
+    >>> prompt = Prompt("{host}:{cwd} > ")
+    >>> prompt.segment("host", lambda: shell.target)
+    >>> prompt.segment("cwd", shorten_path, lambda: shell.cwd)
+    >>> str(prompt)
+    'example.com:~/www > '
+
+    A segment is defined by a function, and by an optional list
+    of input functions. If inputs are given, they are called on each
+    rendering, and the segment function is only called when their
+    values changed, taking them as arguments. Otherwise, the segment
+    function is called on each rendering.
+    The template is only formatted again when a segment value changed.
+
+    """
+    def __init__(self, template):
+        self.template = template
+        self.segments = {}
+        self.values = None
+        self.rendered = None
+
+    def segment(self, name, func, *inputs):
+        """Define the `name` segment, computed by `func(*inputs)`.
+
+        """
+        # [func, inputs, last input values, last segment value]
+        self.segments[name] = [func, inputs, None, None]
+        self.values = None
+
+    def get(self, name):
+        """Return the current value of the `name` segment.
+
+        """
+        segment = self.segments[name]
+        func, inputs = segment[:2]
+        if not inputs:
+            return func()
+        args = tuple(getter() for getter in inputs)
+        if segment[2] != args:
+            segment[3] = func(*args)
+            segment[2] = args
+        return segment[3]
+
+    def __str__(self):
+        values = {name: self.get(name) for name in self.segments}
+        if values != self.values:
+            self.rendered = self.template.format(**values)
+            self.values = values
+        return self.rendered
@@ -0,0 +1,221 @@
+"""Shnake's session recorder and replayer
+
+The Recorder class captures a real interactive session, and the
+Replayer class plays it again against a Shell subclass, offline,
+reporting latencies and return code differences. It eases load
+testing of upgrades with realistic traffic.
+
+Take a look at shell.py cmdloop() and raw_input() methods.
+
+"""
+
+import json
+import time
+import threading
+
+__author__ = "nil0x42 <http://goo.gl/kb2wf>"
+
+
+class Recorder:
+    """Interactive session recorder.
+
+    It takes a file object, a file path or None as main argument
+    (`file`). Each recorded entry is appended to `entries`, and
+    written to `file` (if any) as a JSON line:
+
+    {"time": 1476835200.5, "lines": ["ls \\\\", "/tmp"],
+     "retval": 0, "duration": 0.0042}
+
+    `lines` holds every line read by the shell's raw_input() while
+    processing the entry, PS2 continuations included. The first one
+    is the line read by cmdloop(). `time` is the timestamp of the
+    first line, and `duration` the time spent interpreting it, time
+    spent reading next lines in raw_input() excepted.
+
+    If `file` is a path, the recorder opens it, so it must then be
+    closed with close(), or used as a context manager.
+
+    Case study:
+    -----------
+    >>> with Recorder("session.jsonl") as recorder:
+    ...     shell = MyShell()
+    ...     shell.recorder = recorder
+    ...     shell.cmdloop()
+
+    """
+    def __init__(self, file=None):
+        self.owned = isinstance(file, str)
+        if self.owned:
+            file = open(file, "a")
+        self.file = file
+        self.entries = []
+        self.lines = []
+        self.input_time = 0
+        self.time = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close `file` if it was opened by the recorder.
+
+        """
+        if self.owned:
+            self.file.close()
+
+    def input(self, line, duration=0):
+        """Called by Shell.raw_input() with each line read, and the
+        time spent reading it (`duration`).
+
+        """
+        if not self.lines:
+            self.time = time.time()
+        else:
+            self.input_time += duration
+        self.lines.append(line)
+
+    def command(self, retval, duration):
+        """Called by Shell.cmdloop() once the lines read since last
+        call have been interpreted, in `duration` seconds.
+
+        """
+        entry = {"time": self.time, "lines": self.lines,
+                 "retval": retval, "duration": duration - self.input_time}
+        self.entries.append(entry)
+        self.lines = []
+        self.input_time = 0
+        if self.file is not None:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+
+
+def load(file):
+    """Return the list of entries recorded in `file` (a file object
+    or a file path) by a Recorder.
+
+    """
+    if isinstance(file, str):
+        with open(file) as file:
+            return load(file)
+    return [json.loads(line) for line in file if line.strip()]
+
+
+class Report:
+    """Result of a session replay.
+
+    `latencies` is the list of entry durations, in seconds, and
+    `diffs` a list of (index, lines, recorded retval, replayed retval)
+    tuples for each entry whose return code changed.
+
+    """
+    def __init__(self):
+        self.latencies = []
+        self.diffs = []
+        self.lock = threading.Lock()
+
+    def add(self, index, entry, retval, duration):
+        with self.lock:
+            self.latencies.append(duration)
+            if retval != entry["retval"]:
+                diff = (index, entry["lines"], entry["retval"], retval)
+                self.diffs.append(diff)
+
+    def percentile(self, percent):
+        """Return the `percent`th latency percentile (nearest-rank),
+        or None if nothing was replayed.
+
+        """
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        rank = -(-len(latencies) * percent // 100)  # ceil
+        return latencies[max(int(rank), 1) - 1]
+
+    def __str__(self):
+        result = "%d commands replayed, %d return code differences\n" \
+                 % (len(self.latencies), len(self.diffs))
+        for percent in (50, 90, 99, 100):
+            latency = self.percentile(percent) or 0
+            result += "p%-3d latency: %.3f ms\n" % (percent, latency * 1000)
+        for index, lines, expected, retval in self.diffs:
+            result += "#%d %r: expected %r, got %r\n" \
+                      % (index, "\n".join(lines), expected, retval)
+        return result
+
+
+class Replayer:
+    """Replay recorded sessions against a Shell subclass.
+
+    It takes as arguments a callable returning a new shell instance
+    (`factory`), and a list of entries, as returned by load().
+
+    Each entry's first line is passed to the shell's interpret()
+    method, while next ones are returned by its raw_input() method,
+    just like PS2 continuations were in the recorded session.
+    Reading more lines than recorded raises EOFError.
+
+    Case study:
+    -----------
+    >>> factory = functools.partial(MyShell, stdout=io.StringIO())
+    >>> replayer = Replayer(factory, load("session.jsonl"))
+    >>> print(replayer.run(speed=10, concurrency=50))
+    1200 commands replayed, 0 return code differences
+    ...
+
+    """
+    def __init__(self, factory, entries):
+        self.factory = factory
+        self.entries = entries
+
+    def replay(self, report, speed=None):
+        """Replay the session once on a new shell, adding results
+        to `report`.
+
+        If `speed` is None, entries are replayed as fast as possible.
+        Otherwise, the recorded delays between them are kept, divided
+        by `speed` (so 2 means twice as fast).
+
+        """
+        shell = self.factory()
+        feed = []
+
+        def raw_input(prompt):
+            if not feed:
+                raise EOFError
+            return feed.pop(0)
+        shell.raw_input = raw_input
+
+        start = time.perf_counter()
+        for index, entry in enumerate(self.entries):
+            if speed is not None:
+                delay = (entry["time"] - self.entries[0]["time"]) / speed
+                delay -= time.perf_counter() - start
+                if delay > 0:
+                    time.sleep(delay)
+            feed[:] = entry["lines"][1:]
+            begin = time.perf_counter()
+            try:
+                retval = shell.interpret(entry["lines"][0], interactive=True)
+            # a SystemExit leaves the session, as it did on cmdloop()
+            except SystemExit as e:
+                report.add(index, entry, e.code, time.perf_counter() - begin)
+                break
+            report.add(index, entry, retval, time.perf_counter() - begin)
+
+    def run(self, speed=None, concurrency=1):
+        """Replay the session `concurrency` times simultaneously, each
+        replay in its own thread and on its own shell, then return a
+        Report object.
+
+        """
+        report = Report()
+        threads = [threading.Thread(target=self.replay, args=(report, speed))
+                   for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return report
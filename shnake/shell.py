@@ -39,11 +39,34 @@ Prompt feature:
     makes use of regular expressions to automatically enclose
     enventual prompt's ANSI color codes with '\\01%s\\02', fixing
     readline's prompt length missinterpretation on colored ones.
+    Wrapped prompts are memoized, so unchanged ones are not processed
+    again on each line.
+  * The prompt and prompt_ps2 variables can also be Prompt objects,
+    made of dynamic segments (target host, cwd, ...) which are only
+    recomputed when their inputs change.
   * Since multiline commands are supported, a new variable:
     prompt_ps2 can be used to change PS2 prompt prefix.
   * EOFError raised during input() are the same as sending the
     'exit' command to the interpreter.
 
+Completion feature:
+  * Completion matches are cached for `completion_ttl` seconds, per
+    command, argument position and completed text. A cached result
+    is also reused, once filtered, for longer texts.
+  * If `completion_timeout` is set, complete_*() methods run in
+    background, and stale or partial matches are returned when they
+    take too long, instead of freezing the prompt.
+  * The prefetch_completions() method can be used to compute likely
+    completions in background (after a `cd` command for example).
+
+Session recording:
+  * Setting the `recorder` variable to a session.Recorder object
+    logs every line read by cmdloop() (PS2 continuations included),
+    with timestamps, return codes and durations.
+  * The session.Replayer class replays recorded sessions offline
+    (optionally faster, or many times concurrently), and reports
+    latency percentiles and return code differences.
+
 Exception handling:
   * The new onexception() method has been made to handle exceptions.
     It eases a lot command methods (do_foo()) development, allowing
@@ -76,9 +99,17 @@ Misc behaviors:
     that command return values behavior, meaning that the return
     value will be an interger anyway, 0 in case of no error.
 
+Script execution:
+  * The run_file() method interprets a script file, reading it by
+    large chunks and executing commands as soon as they are parsed,
+    so big generated scripts are never entirely loaded in memory.
+  * Scripts can also be run from command line, with:
+    `python -m shnake [-e] script.shn`
+
 Limitations & Other changes:
   * Unlike 'cmd', the cmdshell library do not provides support for
-    command line interpretation without input() built-in function.
+    command line interpretation without input() built-in function,
+    except for script files, through the run_file() method.
   * Unlike 'cmd', cmdshell is NOT compatible with python 2.x.
 
 
@@ -87,9 +118,12 @@ Limitations & Other changes:
 import sys
 import re
 import cmd
+import time
 
 from .lexer import lex as shnake_lex
 from .parser import parse as shnake_parse
+from .completion import CompletionCache
+from .prompt import wrap_ansi
 
 __author__ = "nil0x42 <http://goo.gl/kb2wf>"
 
@@ -99,28 +133,51 @@ class Shell(cmd.Cmd):
     prompt_ps2 = "> "
     nocmd = "*** Unknow command: %s"
     error = "*** Error raised: %s"
+    completion_ttl = 0
+    completion_timeout = None
+    recorder = None
 
     def __init__(self, completekey='tab', stdin=None, stdout=None):
         super().__init__(completekey=completekey, stdin=stdin, stdout=stdout)
+        # ttl and timeout are updated from attributes on each completion
+        self.completion_cache = CompletionCache()
+        # resolve readline availability once and for all
+        try:
+            __import__("readline")
+            self.has_readline = True
+        except ImportError:
+            self.has_readline = False
+        # resolved on first raw_input() call, and on each cmdloop()
+        self.stdout_isatty = None
 
     def raw_input(self, prompt):
         """An input() wrapper that fixes readline ansi colored prompt
         length missinterpretation by wrapping terminal ansi codes as
         "ANSI" = "\\x01ANSI\\x02".
 
+        `prompt` can be a str or a Prompt object.
+        If a session `recorder` is set, the line is recorded.
+
         """
-        if not self.stdout.isatty():
-            return input()
+        if self.stdout_isatty is None:
+            isatty = getattr(self.stdout, "isatty", lambda: False)
+            self.stdout_isatty = isatty()
+
+        start = time.perf_counter()
+        if not self.stdout_isatty:
+            line = input()
 
         # if not readline, return prompt as it is
-        try:
-            __import__("readline")
-        except:
-            return input(prompt)
+        elif not self.has_readline:
+            line = input(str(prompt))
 
         # else, fix readline length missinterpretation
-        pattern = "\x01?(\x1b\[((?:\d|;)*)([a-zA-Z]))\x02?"
-        return input(re.sub(pattern, "\x01\\1\x02", prompt))
+        else:
+            line = input(wrap_ansi(str(prompt)))
+
+        if self.recorder is not None:
+            self.recorder.input(line, time.perf_counter() - start)
+        return line
 
     def lex(self, string, line=1):
         """The self.lex() method returns a list of commands, each
@@ -151,6 +208,9 @@ class Shell(cmd.Cmd):
             except ImportError:
                 pass
 
+        # stdout may have been replaced since last loop
+        self.stdout_isatty = getattr(self.stdout, "isatty", lambda: False)()
+
         # print intro message (if any)
         if intro:
             self.intro = intro
@@ -166,15 +226,24 @@ class Shell(cmd.Cmd):
                 except EOFError:
                     self.stdout.write("\n")
                     line = "exit"
+                    if self.recorder is not None:
+                        self.recorder.input(line)
                 except BaseException as e:
                     # nothing to interpret on exception
                     self.onexception(e)
                     continue
+                retval = None
+                start = time.perf_counter()
                 try:
-                    self.interpret(line, interactive=True)
+                    retval = self.interpret(line, interactive=True)
                 # system exit is the correct way to leave loop
                 except SystemExit as e:
+                    retval = e.code
                     return e.code
+                finally:
+                    if self.recorder is not None:
+                        duration = time.perf_counter() - start
+                        self.recorder.command(retval, duration)
 
         # restore readline completer (if used)
         finally:
@@ -233,6 +302,50 @@ class Shell(cmd.Cmd):
                 raise SystemExit(self.return_errcode(e.code))
         return self.return_errcode(retval)
 
+    def run_file(self, path, fatal_errors=False, encoding=None):
+        """Interpret the `path` script file as a list of commands.
+
+        Unlike interpret(), the file is not loaded in memory at once:
+        it is read and decoded by large chunks, and each command is
+        executed as soon as it has been parsed.
+
+        NOTE: Commands are lexed with the lex() method, and executed
+              without going through parseline(), so that the script
+              is parsed only once. Unlike interpret(), parseline()
+              overrides are NOT honored: subclasses that expand
+              aliases or variables must do it in lex() to have it
+              applied to script files.
+
+        The `fatal_errors` argument behaves just like interpret()'s one.
+        When it stops the execution, or on syntax, read or decoding
+        errors, an error line is written, prefixed by the script path
+        (and faulty line number, if known), and a non zero value is
+        returned.
+
+        """
+        retval = 0
+        try:
+            # read script by 1MB chunks
+            with open(path, encoding=encoding, buffering=1 << 20) as file:
+                for line, commands in shnake_parse.iterparse(file, self.lex):
+                    retval = self.interpret(commands,
+                                            fatal_errors=fatal_errors)
+                    if fatal_errors and retval != 0:
+                        msg = "%s:%d: exited with status %d"
+                        self.stdout.write(self.error % msg
+                                          % (path, line, retval) + "\n")
+                        return retval
+        except (SyntaxError, SyntaxWarning) as error:
+            msg = "%s:%d: %s" % (path, error.line, error)
+            return self.onexception(type(error)(msg))
+        except UnicodeDecodeError as error:
+            msg = "%s: %s" % (path, error)
+            return self.onexception(UnicodeError(msg))
+        except OSError as error:
+            msg = "%s: %s" % (path, error.strerror or error)
+            return self.onexception(type(error)(msg))
+        return retval
+
     def postcmd(self, retval, argv):
         """Hook method executed just after a command dispatch is finished.
 
@@ -390,28 +503,91 @@ class Shell(cmd.Cmd):
             begidx = readline.get_begidx() - stripped
             endidx = readline.get_endidx() - stripped
 
-            # get the current command's name (argv[0])
-            try:
-                name = self.parseline(line)[-1][0]
-            except:
-                name = None
-            # if the cmd name has been entirely typed, then use it's dedicated
-            # complete_*() method, or fallback to completedefault().
-            if begidx > 0:
-                try:
-                    compfunc = getattr(self, 'complete_'+name)
-                except AttributeError:
-                    compfunc = self.completedefault
-            # if the cmd name is being typed, completion must suggest the
-            # available commands list, aka completenames()
-            else:
-                compfunc = self.completenames
-            self.completion_matches = compfunc(text, line, begidx, endidx)
+            key, compfunc = self.get_compfunc(text, line, begidx, endidx)
+            self.completion_cache.ttl = self.completion_ttl
+            self.completion_cache.timeout = self.completion_timeout
+            self.completion_matches = self.completion_cache.query(
+                key, compfunc, text, line, begidx, endidx)
         try:
             return self.completion_matches[state]+' '
         except IndexError:
             return
 
+    def get_compfunc(self, text, line, begidx, endidx):
+        """Return a (key, compfunc) tuple, where `compfunc` is the
+        method in charge of completing `text` in `line`, and `key` is
+        the (command, argument position, argument) completion cache key,
+        `argument` being the full text of the argument being completed,
+        up to `endidx` (`text` stops at readline delimiters, like "/").
+
+        """
+        # split the last command's words, honoring quotes and escapes,
+        # to get its name, the argument position, and the current word.
+        # (parseline() is not used, it prompts on unclosed quotes)
+        words, start, quote, escaped = [], None, None, False
+        for i, char in enumerate(line[:endidx]):
+            if escaped:
+                escaped = False
+            elif char == "\\" and quote != "'":
+                escaped = True
+            elif quote:
+                if char == quote:
+                    quote = None
+            elif char in "'\"":
+                quote = char
+            elif char in ";&|":
+                words, start = [], None
+                continue
+            elif char.isspace():
+                if start is not None:
+                    words.append(line[start:i])
+                    start = None
+                continue
+            if start is None:
+                start = i
+        argument = "" if start is None else line[start:endidx]
+        argpos = len(words)
+        # if the cmd name has been entirely typed, then use it's dedicated
+        # complete_*() method, or fallback to completedefault().
+        if words:
+            name = words[0]
+            try:
+                compfunc = getattr(self, 'complete_'+name)
+            except AttributeError:
+                compfunc = self.completedefault
+        # if the cmd name is being typed, completion must suggest the
+        # available commands list, aka completenames()
+        else:
+            name = None
+            compfunc = self.completenames
+        return (name, argpos, argument), compfunc
+
+    def prefetch_completions(self, line):
+        """Start computing in background the completions of the
+        argument following `line`, so they are already cached when
+        the user hits Tab. It never blocks.
+
+        It is meant to be called from commands that make some
+        completions likely, for example from do_cd():
+        >>> self.prefetch_completions("ls ")
+
+        Cached completions of the same command are dropped, as they
+        are likely outdated.
+        Prefetched completions are cached for `completion_ttl` seconds,
+        so it does nothing if completion_ttl is 0, unless
+        completion_timeout is set (prefetched matches are then returned
+        as stale ones when the completion query times out).
+
+        """
+        if not self.completion_ttl and self.completion_timeout is None:
+            return
+        line = line.lstrip()
+        key, compfunc = self.get_compfunc("", line, len(line), len(line))
+        self.completion_cache.ttl = self.completion_ttl
+        self.completion_cache.timeout = self.completion_timeout
+        self.completion_cache.prefetch(key, compfunc,
+                                       "", line, len(line), len(line))
+
     def get_names(self, obj=None, filter=''):
         """Pull in 'obj' base class attributes (defaults to self).
         'filter' ads possibility to add a word prefix condition, auto